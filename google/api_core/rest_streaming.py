@@ -14,100 +14,325 @@
 
 """Helpers for server-side streaming in REST."""
 
+import codecs
 from collections import deque
-import string
-from typing import Deque
+import json
+import re
+from typing import Deque, List
 
 import requests
 
 
-class ResponseIterator:
-    """Iterator over REST API responses.
+# Reading the response in large chunks amortizes the per-chunk overhead.
+_DEFAULT_CHUNK_SIZE = 65536
+# Insignificant whitespace as defined by RFC 8259.
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# Whitespace and commas separating elements of the top-level JSON array.
+_SEPARATOR_RE = re.compile(r"[ \t\n\r,]*")
+# Tokens which affect the nesting level of a JSON object: a complete string
+# (skipped as a whole, together with any braces and escaped quotes inside it),
+# a brace, or the opening quote of a string which is not complete yet.
+_STRUCTURAL_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}]|"')
+# Consumed part of the buffer is discarded once it grows past this size.
+_COMPACT_THRESHOLD = 65536
+
+
+def _string_end(buf: str, pos: int) -> int:
+    """Find the end of a JSON string.
+
+    Args:
+        buf (str): The buffer containing the string.
+        pos (int): A position inside of the string which is not preceded by
+            an incomplete escape sequence, such as the position right after
+            the string's opening quote.
+
+    Returns:
+        int: The position right after the string's closing quote, or -1 if
+        the buffer ends before the string does.
+    """
+    start = pos
+    find = buf.find
+    while True:
+        quote = find('"', pos)
+        if quote < 0:
+            return -1
+        # The quote is escaped only if preceded by an odd number of
+        # backslashes, since "\\" is an escaped backslash.
+        escape = quote
+        while escape > start and buf[escape - 1] == "\\":
+            escape -= 1
+        if (quote - escape) % 2 == 0:
+            return quote + 1
+        pos = quote + 1
+
+
+class BaseResponseIterator:
+    """Splits the body of a REST API response into messages.
+
+    Subclasses read the response and feed its decoded text to
+    :meth:`_process_chunk`.
 
     Args:
-        response (requests.Response): An API response object.
         response_message_cls (Callable[proto.Message]): A proto
         class expected to be returned from an API.
     """
 
-    def __init__(self, response: requests.Response, response_message_cls):
-        self._response = response
+    def __init__(self, response_message_cls):
         self._response_message_cls = response_message_cls
-        # Inner iterator over HTTP response's content.
-        self._response_itr = self._response.iter_content(decode_unicode=True)
+        # Bound once, as it is called for every message of the stream.
+        self._from_json = response_message_cls.from_json
+        # JSON is always UTF-8 encoded (RFC 8259), so the raw bytes of the
+        # response are decoded directly rather than by the HTTP library.
+        # The incremental decoder keeps a character split between chunks.
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
         # Contains a list of JSON responses ready to be sent to user.
         self._ready_objs: Deque[str] = deque()
-        # Current JSON response being built.
-        self._obj = ""
-        # Keeps track of the nesting level within a JSON object.
-        self._level = 0
-        # Keeps track whether HTTP response is currently sending values
-        # inside of a string value.
-        self._in_string = False
-        # Whether an escape symbol "\" was encountered.
-        self._escape_next = False
-
-    def cancel(self):
-        """Cancel existing streaming operation."""
-        self._response.close()
+        # Decoder used to extract complete JSON objects from the buffer.
+        self._decoder = json.JSONDecoder()
+        # Received but not yet consumed part of the HTTP response.
+        self._buf = ""
+        # Position in the buffer of the next unconsumed character.
+        self._pos = 0
+        # Chunks received since the buffer was last assembled. While an
+        # incomplete object is scanned, they hold the rest of that object and
+        # are joined only once, when the object is closed.
+        self._chunks: List[str] = []
+        # Whether the object at the buffer position was found incomplete and
+        # each new chunk is scanned for its end.
+        self._scanning = False
+        # Nesting level of the incomplete object at the end of the last chunk.
+        self._scan_level = 0
+        # Whether the last chunk ended inside of a string value.
+        self._scan_in_string = False
+        # Whether the last chunk ended with a backslash escaping the next
+        # character of a string value.
+        self._scan_escaped = False
+        # Whether the opening "[" of the top-level array was consumed.
+        self._started = False
+        # Whether the closing "]" of the top-level array was consumed.
+        self._finished = False
 
     def _process_chunk(self, chunk: str):
-        if self._level == 0:
-            if chunk[0] != "[":
+        if self._scanning:
+            end = self._scan_object(chunk, 0)
+            if end < 0:
+                self._chunks.append(chunk)
+                return
+            # The object is closed in this chunk, assemble it in one go.
+            self._chunks.append(chunk[:end])
+            self._ready_objs.append("".join([self._buf[self._pos :]] + self._chunks))
+            self._chunks.clear()
+            self._scanning = False
+            self._buf = ""
+            self._pos = 0
+            chunk = chunk[end:]
+        self._chunks.append(chunk)
+        # An object can only be completed by a closing brace (and the stream
+        # by a closing bracket), so there is no point in trying to decode the
+        # buffer until one of them arrives. Once the array is closed, any
+        # further data is checked right away.
+        if (
+            self._started
+            and not self._finished
+            and "}" not in chunk
+            and "]" not in chunk
+        ):
+            return
+        self._buf = "".join([self._buf] + self._chunks)
+        self._chunks.clear()
+        if not self._started:
+            match = _WHITESPACE_RE.match(self._buf, self._pos)
+            # The pattern matches the empty string, so it always matches.
+            assert match is not None
+            self._pos = match.end()
+            if self._pos == len(self._buf):
+                return
+            if self._buf[self._pos] != "[":
+                raise ValueError(
+                    "Can only parse array of JSON objects, instead got %s" % self._buf
+                )
+            self._pos += 1
+            self._started = True
+        buf = self._buf
+        pos = self._pos
+        skip_separators = _SEPARATOR_RE.match
+        while not self._finished:
+            match = skip_separators(buf, pos)
+            assert match is not None
+            pos = match.end()
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                self._finished = True
+                pos += 1
+                break
+            if buf[pos] != "{":
+                raise ValueError(
+                    "Can only parse array of JSON objects, instead got %s" % buf[pos:]
+                )
+            try:
+                _, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The object is not complete yet. Rather than decoding it
+                # again from the start whenever more data arrives, track its
+                # nesting level chunk by chunk until it is closed.
+                self._scan_level = 0
+                self._scan_in_string = False
+                self._scan_escaped = False
+                end = self._scan_object(buf, pos)
+                if end < 0:
+                    self._scanning = True
+                    break
+            self._ready_objs.append(buf[pos:end])
+            pos = end
+        if self._finished:
+            # Only whitespace may follow the end of the top-level array.
+            match = _WHITESPACE_RE.match(buf, pos)
+            assert match is not None
+            pos = match.end()
+            if pos != len(buf):
                 raise ValueError(
-                    "Can only parse array of JSON objects, instead got %s" % chunk
+                    "Can only parse array of JSON objects, instead got %s" % buf[pos:]
                 )
-        for char in chunk:
-            if char == "{":
-                if self._level == 1:
-                    # Level 1 corresponds to the outermost JSON object
-                    # (i.e. the one we care about).
-                    self._obj = ""
-                if not self._in_string:
-                    self._level += 1
-                self._obj += char
-            elif char == "}":
-                self._obj += char
-                if not self._in_string:
-                    self._level -= 1
-                if not self._in_string and self._level == 1:
-                    self._ready_objs.append(self._obj)
-            elif char == '"':
-                # Helps to deal with an escaped quotes inside of a string.
-                if not self._escape_next:
-                    self._in_string = not self._in_string
-                self._obj += char
-            elif char in string.whitespace:
-                if self._in_string:
-                    self._obj += char
-            elif char == "[":
-                if self._level == 0:
-                    self._level += 1
-                else:
-                    self._obj += char
-            elif char == "]":
-                if self._level == 1:
-                    self._level -= 1
-                else:
-                    self._obj += char
+        if pos == len(buf):
+            # Nothing left to keep, so later chunks are not joined with
+            # already consumed text.
+            self._buf = ""
+            pos = 0
+        elif pos > _COMPACT_THRESHOLD:
+            # Only an incomplete object, which is being scanned, is left.
+            self._buf = buf[pos:]
+            pos = 0
+        self._pos = pos
+
+    def _scan_object(self, buf: str, pos: int) -> int:
+        """Continue scanning an incomplete object.
+
+        Args:
+            buf (str): The buffer containing the next part of the object.
+            pos (int): The position in the buffer to scan from.
+
+        Returns:
+            int: The position right after the object's closing brace, or -1
+            if the object is still incomplete.
+        """
+        level = self._scan_level
+        in_string = self._scan_in_string
+        escaped = self._scan_escaped
+        if escaped and pos < len(buf):
+            # Skip the character escaped at the end of the previous chunk.
+            pos += 1
+            escaped = False
+        while True:
+            if in_string:
+                start = pos
+                pos = _string_end(buf, pos)
+                if pos < 0:
+                    # Remember whether the buffer ends with an odd number of
+                    # backslashes, which escape the next chunk's character.
+                    escape = len(buf)
+                    while escape > start and buf[escape - 1] == "\\":
+                        escape -= 1
+                    escaped = escaped or (len(buf) - escape) % 2 == 1
+                    break
+                in_string = False
+            for match in _STRUCTURAL_RE.finditer(buf, pos):
+                token = match.group()
+                if token == "{":
+                    level += 1
+                elif token == "}":
+                    level -= 1
+                    if level == 0:
+                        return match.end()
+                elif token == '"':
+                    # Continue looking for the end of this string once more
+                    # data arrives, rather than matching it again from the
+                    # start.
+                    in_string = True
+                    pos = match.end()
+                    break
             else:
-                self._obj += char
-            self._escape_next = not self._escape_next if char == "\\" else False
+                break
+        self._scan_level = level
+        self._scan_in_string = in_string
+        self._scan_escaped = escaped
+        return -1
+
+    def _check_finished(self):
+        # An empty response body carries no messages and is not an error.
+        if self._started and not self._finished:
+            raise ValueError(
+                "Unfinished stream: %s"
+                % "".join([self._buf[self._pos :]] + self._chunks)
+            )
+
+    def _grab(self):
+        # The buffered objects are already JSON text, parse them directly.
+        return self._from_json(self._ready_objs.popleft())
+
+
+class ResponseIterator(BaseResponseIterator):
+    """Iterator over REST API responses.
+
+    Args:
+        response (requests.Response): An API response object.
+        response_message_cls (Callable[proto.Message]): A proto
+        class expected to be returned from an API.
+        chunk_size (int): The maximum number of bytes read from the
+            response at once. Chunked responses are still returned as soon
+            as each HTTP chunk arrives.
+    """
+
+    def __init__(
+        self,
+        response: requests.Response,
+        response_message_cls,
+        chunk_size: int = _DEFAULT_CHUNK_SIZE,
+    ):
+        super().__init__(response_message_cls)
+        self._response = response
+        # Inner iterator over HTTP response's content.
+        self._response_itr = self._response.iter_content(
+            chunk_size=chunk_size, decode_unicode=False
+        )
+
+    def cancel(self):
+        """Cancel existing streaming operation."""
+        self._response.close()
 
     def __next__(self):
         while not self._ready_objs:
             try:
                 chunk = next(self._response_itr)
-                self._process_chunk(chunk)
+                self._process_chunk(self._text_decoder.decode(chunk))
             except StopIteration as e:
-                if self._level > 0:
-                    raise ValueError("Unfinished stream: %s" % self._obj)
+                # Raises on a multibyte character cut off by the end of the
+                # stream, otherwise there is no text left to flush.
+                self._text_decoder.decode(b"", final=True)
+                self._check_finished()
                 raise e
         return self._grab()
 
-    def _grab(self):
-        # Add extra quotes to make json.loads happy.
-        return self._response_message_cls.from_json(self._ready_objs.popleft())
+    def read_all(self) -> List:
+        """Read all remaining messages of the stream at once.
+
+        This is faster than iterating when the messages do not need to be
+        processed as they arrive, since the rest of the response is split
+        as a single chunk.
+
+        Returns:
+            List[proto.Message]: The messages not consumed by iteration yet.
+
+        Raises:
+            ValueError: If the response is not a complete array of JSON
+                objects.
+        """
+        body = b"".join(self._response_itr)
+        self._process_chunk(self._text_decoder.decode(body, final=True))
+        self._check_finished()
+        messages = [self._from_json(obj) for obj in self._ready_objs]
+        self._ready_objs.clear()
+        return messages
 
     def __iter__(self):
         return self
@@ -0,0 +1,63 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""AsyncIO helpers for server-side streaming in REST."""
+
+from google.api_core import rest_streaming
+
+
+class AsyncResponseIterator(rest_streaming.BaseResponseIterator):
+    """Asynchronous iterator over REST API responses.
+
+    Allows many streams to be consumed concurrently from a single event
+    loop, rather than with a thread per :class:`.ResponseIterator`.
+
+    Args:
+        response (aiohttp.ClientResponse): An API response object.
+        response_message_cls (Callable[proto.Message]): A proto
+        class expected to be returned from an API.
+        chunk_size (int): The maximum number of bytes read from the
+            response at once.
+    """
+
+    def __init__(
+        self,
+        response,
+        response_message_cls,
+        chunk_size: int = rest_streaming._DEFAULT_CHUNK_SIZE,
+    ):
+        super().__init__(response_message_cls)
+        self._response = response
+        # Inner iterator over HTTP response's content.
+        self._response_itr = self._response.content.iter_chunked(chunk_size)
+
+    def cancel(self):
+        """Cancel existing streaming operation."""
+        self._response.close()
+
+    async def __anext__(self):
+        while not self._ready_objs:
+            try:
+                chunk = await self._response_itr.__anext__()
+                self._process_chunk(self._text_decoder.decode(chunk))
+            except StopAsyncIteration as e:
+                # Raises on a multibyte character cut off by the end of the
+                # stream, otherwise there is no text left to flush.
+                self._text_decoder.decode(b"", final=True)
+                self._check_finished()
+                raise e
+        return self._grab()
+
+    def __aiter__(self):
+        return self
@@ -0,0 +1,125 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from typing import List
+
+import mock
+import proto
+import pytest
+
+from google.api_core import rest_streaming_async
+
+
+__protobuf__ = proto.module(package=__name__)
+
+
+class EchoResponse(proto.Message):
+    content = proto.Field(proto.STRING, number=1)
+
+
+class ResponseMock:
+    """Mimics the parts of ``aiohttp.ClientResponse`` used for streaming."""
+
+    class _StreamReader:
+        def __init__(self, response_bytes: bytes, random_split: bool):
+            self._response_bytes = response_bytes
+            self._random_split = random_split
+            self.chunk_size = None
+
+        async def _chunks(self):
+            i = 0
+            while i < len(self._response_bytes):
+                if self._random_split:
+                    n = random.randint(1, self.chunk_size)
+                else:
+                    n = self.chunk_size
+                yield self._response_bytes[i : i + n]
+                i += n
+
+        def iter_chunked(self, n):
+            self.chunk_size = n
+            return self._chunks()
+
+    def __init__(self, response_bytes: bytes, random_split=False):
+        self.content = self._StreamReader(response_bytes, random_split)
+        self.close = mock.Mock()
+
+
+def _to_bytes(responses: List[EchoResponse]) -> bytes:
+    json_responses = [EchoResponse.to_json(r) for r in responses]
+    return "[{}]".format(",".join(json_responses)).encode("utf-8")
+
+
+async def _consume(itr):
+    return [response async for response in itr]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("random_split", [True, False])
+async def test_next(random_split):
+    responses = [EchoResponse(content="hello world"), EchoResponse(content="yes")]
+    resp = ResponseMock(_to_bytes(responses), random_split=random_split)
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse, 2)
+    assert await _consume(itr) == responses
+    assert resp.content.chunk_size == 2
+
+
+@pytest.mark.asyncio
+async def test_next_default_chunk_size():
+    responses = [EchoResponse(content="a" * 1000) for _ in range(100)]
+    resp = ResponseMock(_to_bytes(responses))
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    assert await _consume(itr) == responses
+    assert resp.content.chunk_size == 65536
+
+
+@pytest.mark.asyncio
+async def test_next_empty_body():
+    resp = ResponseMock(b"")
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    assert await _consume(itr) == []
+
+
+@pytest.mark.asyncio
+async def test_next_not_array():
+    resp = ResponseMock(b'{"hello": 0}')
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    with pytest.raises(ValueError):
+        await itr.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_next_unfinished():
+    resp = ResponseMock(b'[{"content": "hello"}, {')
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    assert await itr.__anext__() == EchoResponse(content="hello")
+    with pytest.raises(ValueError):
+        await itr.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_next_truncated_trailing_character():
+    resp = ResponseMock(b'[{"content": "a"}]\xe2\x82', random_split=True)
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    assert await itr.__anext__() == EchoResponse(content="a")
+    with pytest.raises(UnicodeDecodeError):
+        await itr.__anext__()
+
+
+def test_cancel():
+    resp = ResponseMock(b"[]")
+    itr = rest_streaming_async.AsyncResponseIterator(resp, EchoResponse)
+    itr.cancel()
+    resp.close.assert_called_once()
@@ -25,6 +25,7 @@ import requests
 
 from google.api_core import rest_streaming
 from google.protobuf import duration_pb2
+from google.protobuf import json_format
 from google.protobuf import timestamp_pb2
 
 
@@ -81,7 +82,10 @@ class ResponseMock(requests.Response):
                 n = 1
             x = self._responses_bytes[self._i : self._i + n]
             self._i += n
-            return x.decode("utf-8")
+            return x
+
+        def __iter__(self):
+            return self
 
     def __init__(
         self,
@@ -171,9 +175,169 @@ def test_next_escaped_characters_in_string(random_split):
     assert list(itr) == responses
 
 
+def test_next_escaped_quotes_any_split():
+    responses = [
+        Song(title='\\"}', lyrics='\\\\"{'),
+        Song(title="\\", lyrics='{"\\\\\\"}'),
+        Song(title="}\\\\", composer=Composer(given_name='"\\\\')),
+    ]
+    payload = ResponseMock(responses=[], response_cls=Song)._parse_responses(responses)
+    # Split the stream at every possible position, so that the end of an
+    # object is looked for across chunks right after each backslash and quote.
+    for i in range(1, len(payload)):
+        with patch.object(
+            ResponseMock,
+            "iter_content",
+            return_value=iter([payload[:i], payload[i:]]),
+        ):
+            resp = ResponseMock(responses=[], response_cls=Song)
+            itr = rest_streaming.ResponseIterator(resp, Song)
+            assert list(itr) == responses
+
+
+@pytest.mark.parametrize("random_split", [True, False])
+def test_next_multibyte_characters(random_split):
+    responses = [
+        EchoResponse(content="żółć"),
+        EchoResponse(content="日本語"),
+        EchoResponse(content="\U0001f600"),
+    ]
+    # Send non-ASCII characters unescaped so that they can be split
+    # between chunks.
+    payload = '[{"content": "żółć"}, {"content": "日本語"}, {"content": "\U0001f600"}]'
+    with patch.object(
+        ResponseMock, "_parse_responses", return_value=payload.encode("utf-8")
+    ):
+        resp = ResponseMock(
+            responses=[], random_split=random_split, response_cls=EchoResponse
+        )
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert list(itr) == responses
+
+
+def test_next_leading_whitespace():
+    with patch.object(
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b" \n", b' [{"content": "hello"}', b",\n", b"]"]),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert list(itr) == [EchoResponse(content="hello")]
+
+
+def test_next_large_stream():
+    n = 1000
+    responses = [EchoResponse(content="x" * 100 + str(i)) for i in range(n)]
+    resp = ResponseMock(
+        responses=responses, random_split=True, response_cls=EchoResponse
+    )
+    itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+    assert list(itr) == responses
+
+
+@pytest.mark.parametrize("random_split", [True, False])
+def test_next_large_objects(random_split):
+    n = 20
+    responses = [
+        Song(
+            title="title_%d" % i,
+            lyrics='la "la" {la}\\' * 1000,
+            composer=Composer(given_name="name_%d" % i, relateds=["a"] * 100),
+        )
+        for i in range(n)
+    ]
+    resp = ResponseMock(
+        responses=responses, random_split=random_split, response_cls=Song
+    )
+    itr = rest_streaming.ResponseIterator(resp, Song)
+    assert list(itr) == responses
+
+
+def test_next_passes_object_text_to_from_json():
+    payload = '[{"content": "a \\"quoted\\" {value}"}, {"content": "b"}]'
+    with patch.object(
+        ResponseMock, "_parse_responses", return_value=payload.encode("utf-8")
+    ), patch.object(
+        EchoResponse, "from_json", wraps=EchoResponse.from_json
+    ) as mock_from_json:
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert list(itr) == [
+            EchoResponse(content='a "quoted" {value}'),
+            EchoResponse(content="b"),
+        ]
+        assert mock_from_json.call_args_list == [
+            ((r'{"content": "a \"quoted\" {value}"}',),),
+            (('{"content": "b"}',),),
+        ]
+
+
+@pytest.mark.parametrize("body", [[], [b""], [b" \n"]])
+def test_next_empty_body(body):
+    with patch.object(ResponseMock, "iter_content", return_value=iter(body)):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert list(itr) == []
+
+
+def test_read_all_empty_body():
+    with patch.object(ResponseMock, "iter_content", return_value=iter([])):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert itr.read_all() == []
+
+
+def test_next_drops_consumed_buffer():
+    with patch.object(
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b'[{"content": "a"}', b', {"content": "b"}', b"]"]),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert next(itr) == EchoResponse(content="a")
+        assert itr._buf == ""
+        assert next(itr) == EchoResponse(content="b")
+        assert itr._buf == ""
+
+
+class _BufferCountingIterator(rest_streaming.ResponseIterator):
+    """Counts how many times the buffer is rebuilt."""
+
+    buf_builds = 0
+
+    @property
+    def _buf(self):
+        return self._counted_buf
+
+    @_buf.setter
+    def _buf(self, value):
+        self.buf_builds += 1
+        self._counted_buf = value
+
+
+def test_next_large_object_buffer_not_rebuilt_per_chunk():
+    song = Song(
+        title="title",
+        lyrics='la "la" {la} [la] \\' * 5000,
+        composer=Composer(given_name="name", relateds=["a"] * 5000),
+    )
+    payload = ResponseMock(responses=[], response_cls=Song)._parse_responses([song])
+    chunks = [payload[i : i + 1024] for i in range(0, len(payload), 1024)]
+    with patch.object(ResponseMock, "iter_content", return_value=iter(chunks)):
+        resp = ResponseMock(responses=[], response_cls=Song)
+        itr = _BufferCountingIterator(resp, Song)
+        assert list(itr) == [song]
+    # Almost every chunk contains a closing brace or bracket, but the object
+    # is still only assembled once rather than on every chunk.
+    assert len(chunks) > 100
+    assert itr.buf_builds <= 5
+
+
 def test_next_not_array():
     with patch.object(
-        ResponseMock, "iter_content", return_value=iter('{"hello": 0}')
+        ResponseMock, "iter_content", return_value=iter([b'{"hello": 0}'])
     ) as mock_method:
 
         resp = ResponseMock(responses=[], response_cls=EchoResponse)
@@ -183,6 +347,58 @@ def test_next_not_array():
         mock_method.assert_called_once()
 
 
+@pytest.mark.parametrize("chunk_size", [None, 1024])
+def test_chunk_size(chunk_size):
+    with patch.object(
+        ResponseMock, "iter_content", return_value=iter([b"[]"])
+    ) as mock_method:
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        if chunk_size is None:
+            itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+            expected_chunk_size = 65536
+        else:
+            itr = rest_streaming.ResponseIterator(resp, EchoResponse, chunk_size)
+            expected_chunk_size = chunk_size
+        assert list(itr) == []
+        mock_method.assert_called_once_with(
+            chunk_size=expected_chunk_size, decode_unicode=False
+        )
+
+
+@pytest.mark.parametrize("random_split", [True, False])
+def test_read_all(random_split):
+    responses = [
+        Song(title="title_%d" % i, composer=Composer(given_name="name_%d" % i))
+        for i in range(10)
+    ]
+    resp = ResponseMock(
+        responses=responses, random_split=random_split, response_cls=Song
+    )
+    itr = rest_streaming.ResponseIterator(resp, Song)
+    assert itr.read_all() == responses
+
+
+def test_read_all_after_next():
+    responses = [EchoResponse(content="hello"), EchoResponse(content="world")]
+    resp = ResponseMock(responses=responses, response_cls=EchoResponse)
+    itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+    assert next(itr) == responses[0]
+    assert itr.read_all() == responses[1:]
+    assert itr.read_all() == []
+
+
+def test_read_all_unfinished():
+    with patch.object(
+        ResponseMock,
+        "_parse_responses",
+        return_value=bytes('[{"content": "hello"}, {', "utf-8"),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        with pytest.raises(ValueError):
+            itr.read_all()
+
+
 def test_cancel():
     with patch.object(ResponseMock, "close", return_value=None) as mock_method:
         resp = ResponseMock(responses=[], response_cls=EchoResponse)
@@ -204,9 +420,86 @@ def test_check_buffer():
             next(itr)
 
 
+def test_next_not_object():
+    with patch.object(
+        ResponseMock,
+        "_parse_responses",
+        return_value=bytes('[{"content": "hello"}, "world"]', "utf-8"),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert next(itr) == EchoResponse(content="hello")
+        with pytest.raises(ValueError):
+            next(itr)
+
+
+@pytest.mark.parametrize("trailing", ['{"content": "b"}', ' {"content": "b"}', "]"])
+def test_next_trailing_data(trailing):
+    with patch.object(
+        ResponseMock,
+        "_parse_responses",
+        return_value=bytes('[{"content": "a"}]' + trailing, "utf-8"),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert next(itr) == EchoResponse(content="a")
+        with pytest.raises(ValueError):
+            next(itr)
+
+
+def test_next_trailing_data_same_chunk():
+    with patch.object(
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b'[{"content": "a"}] {"content": "b"}']),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        with pytest.raises(ValueError):
+            next(itr)
+
+
+def test_next_trailing_whitespace():
+    with patch.object(
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b'[{"content": "a"}]\n', b" \r\n"]),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert list(itr) == [EchoResponse(content="a")]
+
+
+def test_next_malformed_object():
+    with patch.object(
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b'[{"content": }, {"content": "b"}]']),
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        with pytest.raises(json_format.ParseError):
+            next(itr)
+
+
+def test_next_truncated_trailing_character():
+    with patch.object(
+        ResponseMock,
+        "_parse_responses",
+        return_value=b'[{"content": "a"}]\xe2\x82',
+    ):
+        resp = ResponseMock(responses=[], response_cls=EchoResponse)
+        itr = rest_streaming.ResponseIterator(resp, EchoResponse)
+        assert next(itr) == EchoResponse(content="a")
+        with pytest.raises(UnicodeDecodeError):
+            next(itr)
+
+
 def test_next_html():
     with patch.object(
-        ResponseMock, "iter_content", return_value=iter("<!DOCTYPE html><html></html>")
+        ResponseMock,
+        "iter_content",
+        return_value=iter([b"<!DOCTYPE html><html></html>"]),
     ) as mock_method:
 
         resp = ResponseMock(responses=[], response_cls=EchoResponse)